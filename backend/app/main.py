@@ -1,10 +1,23 @@
 # Backend v0.1 - main.py
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .routers import detect
 from .utils.selftest import run_selftest
+from .services._kernels import warmup
 
-app = FastAPI(title="KI Detector Backend v0.1")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Numba-Kernel beim Start kompilieren, nicht im ersten Request
+    warmup()
+    yield
+
+
+app = FastAPI(
+    title="KI Detector Backend v0.1",
+    lifespan=lifespan,
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -1,9 +1,66 @@
-from fastapi import APIRouter, UploadFile, File
+import copy
+import threading
+import xxhash
+from collections import OrderedDict
+from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from ..models.response import DetectionResponse
 from ..services.image_detector import analyze_image
+from ..utils.settings import MAX_FILE_SIZE_MB
 
 router = APIRouter()
 
-@router.post("/detect/image")
-async def detect_image(file: UploadFile = File(...)):
+# LRU-Cache: identische Uploads (Retries, Crawler) überspringen die Analyse
+_CACHE_MAX_ENTRIES = 1024
+_CACHE: "OrderedDict[bytes, dict]" = OrderedDict()
+_CACHE_LOCK = threading.Lock()
+
+# Upload-Limit, gemeinsam mit HeuristicConfig.max_file_size_mb (v0.6)
+_UPLOAD_LIMIT = MAX_FILE_SIZE_MB * 1024 * 1024
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Image too large (max: {MAX_FILE_SIZE_MB}MB)",
+    )
+
+
+async def _read_upload(file: UploadFile) -> bytes:
+    # Starlette hat den Body bereits gepuffert: file.size erlaubt die
+    # Ablehnung vor dem Lesen, ein blockweises Lesen bricht nichts früher ab
+    if file.size is not None and file.size > _UPLOAD_LIMIT:
+        raise _too_large()
+
     data = await file.read()
-    return analyze_image(data)
+    if len(data) > _UPLOAD_LIMIT:
+        raise _too_large()
+    return data
+
+
+def _cached_analyze(data: bytes) -> dict:
+    key = xxhash.xxh3_128(data).digest()
+
+    with _CACHE_LOCK:
+        hit = _CACHE.get(key)
+        if hit is not None:
+            _CACHE.move_to_end(key)
+            return copy.deepcopy(hit)
+
+    result = analyze_image(data)
+
+    with _CACHE_LOCK:
+        _CACHE[key] = result
+        _CACHE.move_to_end(key)
+        while len(_CACHE) > _CACHE_MAX_ENTRIES:
+            _CACHE.popitem(last=False)
+
+    return copy.deepcopy(result)
+
+
+@router.post("/detect/image", response_model=DetectionResponse)
+async def detect_image(file: UploadFile = File(...)):
+    data = await _read_upload(file)
+    # Analyse im Threadpool: blockiert den Event-Loop nicht, Numba-Kernel
+    # (nogil) und PIL-Filter laufen für parallele Requests echt parallel
+    return await run_in_threadpool(_cached_analyze, data)
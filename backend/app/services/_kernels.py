@@ -0,0 +1,131 @@
+"""
+===========================================================
+ KI-DETECTOR – NUMBA KERNELS
+ Purpose:
+   - Fusionierte Ein-Pass-Statistiken über Pixelpuffer
+   - Ersetzt mehrfache convert()/percentile()/ImageStat-Durchläufe
+   - nogil: parallele Requests (Threadpool) rechnen gleichzeitig
+===========================================================
+"""
+
+import numpy as np
+from numba import njit
+from PIL import Image
+from typing import Tuple
+
+
+@njit(cache=True, fastmath=True, nogil=True)
+def _hist_stats(hist: np.ndarray, n: int) -> Tuple[float, float, float, float]:
+    """(white_ratio, low_p10, variance, mean) aus einem 256-Bin-Histogramm."""
+    s = 0.0
+    ss = 0.0
+    white = 0
+    for v in range(256):
+        c = hist[v]
+        s += c * v
+        ss += c * v * v
+        if v > 240:
+            white += c
+
+    mean = s / n
+    variance = ss / n - mean * mean
+
+    # 10%-Perzentil per Kumulativsumme über das Histogramm (kein Sortieren)
+    rank = int(0.10 * (n - 1))
+    low_p10 = 255.0
+    acc = 0
+    for v in range(256):
+        acc += hist[v]
+        if acc > rank:
+            low_p10 = float(v)
+            break
+
+    return white / n, low_p10, variance, mean
+
+
+@njit(cache=True, fastmath=True, nogil=True)
+def _find_edges_at(band: np.ndarray, y: int, x: int, h: int, w: int) -> int:
+    """
+    Wert von ImageFilter.FIND_EDGES an (y, x): 3×3-Laplace, auf 0..255
+    geklemmt; Randpixel übernimmt PIL unverändert aus dem Eingangsbild.
+    """
+    c = np.int64(band[y, x])
+    if y == 0 or x == 0 or y == h - 1 or x == w - 1:
+        return c
+    s = np.int64(0)
+    for dy in range(-1, 2):
+        for dx in range(-1, 2):
+            s += band[y + dy, x + dx]
+    return min(max(9 * c - s, 0), 255)
+
+
+@njit(cache=True, fastmath=True, nogil=True)
+def luma_stats(arr: np.ndarray) -> Tuple[float, float, float, float, float]:
+    """
+    Ein Durchlauf über ein uint8-Luminanzbild (H×W).
+    edge_mean entspricht ImageStat.Stat(img.filter(FIND_EDGES)).mean[0].
+    Returns: (white_ratio, low_p10, variance, mean, edge_mean)
+    """
+    h, w = arr.shape
+    hist = np.zeros(256, np.int64)
+    edge_sum = np.int64(0)
+    for y in range(h):
+        for x in range(w):
+            hist[arr[y, x]] += 1
+            edge_sum += _find_edges_at(arr, y, x, h, w)
+
+    n = h * w
+    white_ratio, low_p10, variance, mean = _hist_stats(hist, n)
+    return white_ratio, low_p10, variance, mean, edge_sum / n
+
+
+@njit(cache=True, fastmath=True, nogil=True)
+def rgb_luma_stats(
+    arr: np.ndarray,
+) -> Tuple[float, float, float, float, float, float, float, float]:
+    """
+    Luminanz-, Kanten- und Kanal-Statistiken in einem Durchlauf über H×W×3.
+    Luminanz nach ITU-R 601 in Festkomma, identisch zu PIL convert("L");
+    edge_mean ist FIND_EDGES auf dem ersten Band (R), wie ImageStat.mean[0].
+    Returns: (white_ratio, low_p10, variance, mean, edge_mean,
+              std_r, std_g, std_b)
+    """
+    h, w, _ = arr.shape
+    red = arr[:, :, 0]
+    hist = np.zeros(256, np.int64)
+    s = np.zeros(3, np.int64)
+    ss = np.zeros(3, np.int64)
+    edge_sum = np.int64(0)
+    for y in range(h):
+        for x in range(w):
+            r = np.int64(arr[y, x, 0])
+            g = np.int64(arr[y, x, 1])
+            b = np.int64(arr[y, x, 2])
+            s[0] += r
+            s[1] += g
+            s[2] += b
+            ss[0] += r * r
+            ss[1] += g * g
+            ss[2] += b * b
+            hist[(r * 19595 + g * 38470 + b * 7471 + 0x8000) >> 16] += 1
+            edge_sum += _find_edges_at(red, y, x, h, w)
+
+    n = h * w
+    std = np.zeros(3, np.float64)
+    for c in range(3):
+        m = s[c] / n
+        std[c] = np.sqrt(max(ss[c] / n - m * m, 0.0))
+
+    white_ratio, low_p10, variance, mean = _hist_stats(hist, n)
+    return (white_ratio, low_p10, variance, mean, edge_sum / n,
+            std[0], std[1], std[2])
+
+
+def warmup() -> None:
+    """
+    JIT-Kompilierung vorziehen (App-Start / Selbsttest).
+    np.asarray() auf PIL-Bildern liefert read-only Arrays – Numba kompiliert
+    dafür eine eigene Signatur, daher mit echten PIL-Puffern aufwärmen.
+    """
+    luma_stats(np.asarray(Image.new("L", (32, 32))))
+    rgb_luma_stats(np.asarray(Image.new("RGB", (32, 32))))
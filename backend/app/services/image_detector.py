@@ -14,16 +14,22 @@
 """
 
 import io
+import re
 import numpy as np
 from PIL import (
     Image,
     ExifTags,
-    ImageStat,
     ImageOps,
     ImageFilter
 )
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple, Union
 from ..utils.logging import logger
+from ._kernels import luma_stats, rgb_luma_stats, warmup
+
+
+# EXIF-Tag-IDs für Direktzugriff statt Iteration über alle Tags
+_TAG_MAKE = ExifTags.Base.Make
+_CAMERA_RE = re.compile(r"canon|sony|nikon|fujifilm", re.IGNORECASE)
 
 
 # -----------------------------------------------------------
@@ -32,6 +38,9 @@ from ..utils.logging import logger
 def selftest() -> Dict:
     """Rudimentärer Modul-Selbsttest."""
     try:
+        # JIT-Kernel vorwärmen (Kompilierung nicht im ersten Request)
+        warmup()
+
         test_img = Image.new("RGB", (400, 400), color="gray")
         buf = io.BytesIO()
         test_img.save(buf, format="JPEG")
@@ -45,24 +54,83 @@ def selftest() -> Dict:
 # HILFSFUNKTIONEN
 # -----------------------------------------------------------
 
-def load_image(data: bytes) -> Image.Image:
+def load_image(
+    data: Union[bytes, io.BytesIO]
+) -> Tuple[Image.Image, Tuple[int, int]]:
+    """
+    Lädt das Bild in voller Auflösung und gibt zusätzlich die Größe zurück.
+    Kein draft(): Varianz, Kanten und Kanal-Std sind auf Originalauflösung
+    kalibriert, eine DCT-verkleinerte Dekodierung verschiebt die Werte.
+    Ein Upload-Puffer (BytesIO) wird ohne Kopie direkt gelesen.
+    RGB- und Graustufenbilder (L) werden nicht konvertiert.
+    """
     try:
-        return Image.open(io.BytesIO(data)).convert("RGB")
+        if isinstance(data, io.BytesIO):
+            data.seek(0)
+            stream = data
+        else:
+            stream = io.BytesIO(data)
+        img = Image.open(stream)
+        size = img.size
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        # Pixel hier dekodieren: defekte Dateien scheitern beim Laden
+        img.load()
+        return img, size
     except Exception as e:
-        logger.error(f"Bild konnte nicht geladen werden: {e}")
+        logger.error("Bild konnte nicht geladen werden: %s", e)
         raise
 
 
+def working_copy(img: Image.Image, max_edge: int = 512) -> Image.Image:
+    """
+    Verkleinerte Arbeitskopie als Quelle für Thumbnails fester Größe.
+    Skalenabhängige Statistiken (Varianz, Kanal-Std) nicht hierauf rechnen.
+    """
+    w, h = img.size
+    scale = max_edge / max(w, h)
+    if scale >= 1:
+        return img
+    size = (max(1, round(w * scale)), max(1, round(h * scale)))
+    return img.resize(size, Image.Resampling.BILINEAR)
+
+
+def _compute_stats(img: Image.Image) -> Dict:
+    """Alle Pixel-Statistiken einmalig – Heuristiken prüfen nur Schwellen."""
+    # Luminanz-, Kanten- und Kanal-Statistiken in einem Pass über das volle
+    # Bild (Schwellen sind auf Originalauflösung kalibriert)
+    if img.mode == "L":
+        # Graustufen: keine Farbkanäle
+        white_ratio, low_p10, variance, _, edge_mean = luma_stats(np.asarray(img))
+        channel_std = None
+    else:
+        white_ratio, low_p10, variance, _, edge_mean, *channel = rgb_luma_stats(
+            np.asarray(img)
+        )
+        channel_std = tuple(channel)
+
+    # Kontur-Thumbnail 128×128 (eigene Statistik für weird_hand_score)
+    thumb = working_copy(img).resize((128, 128), Image.Resampling.BICUBIC)
+    edges_thumb = np.asarray(thumb.filter(ImageFilter.FIND_EDGES))
+    if edges_thumb.ndim == 3:
+        edges_thumb = edges_thumb[..., 0]  # erstes Band, wie ImageStat.mean[0]
+
+    return {
+        "white_ratio": white_ratio,
+        "low_p10": low_p10,
+        "variance": variance,
+        "channel_std": channel_std,
+        "edge_mean": edge_mean,
+        "thumb_edge_mean": float(edges_thumb.mean(dtype=np.float64)),
+    }
+
+
 # -----------------------------------------------------------
 # HEAVY HEURISTICS v0.5
 # -----------------------------------------------------------
 
-def detect_paper_or_scan(img: Image.Image, warnings: List[str]) -> float:
+def detect_paper_or_scan(white_ratio: float, warnings: List[str]) -> float:
     """Entlastet typische Papier-/Scanbilder."""
-    gray = img.convert("L")
-    pixels = np.array(gray)
-    white_ratio = (pixels > 240).mean()
-
     if white_ratio > 0.65:
         warnings.append("Papier/Scan erkannt – geringes KI-Risiko.")
         return -0.25
@@ -70,14 +138,19 @@ def detect_paper_or_scan(img: Image.Image, warnings: List[str]) -> float:
     return 0.0
 
 
-def base_score_from_image(img: Image.Image, warnings: List[str]) -> float:
+def base_score_from_image(
+    size: Tuple[int, int],
+    white_ratio: float,
+    low_p: float,
+    warnings: List[str],
+) -> float:
     """Dynamischer Startwert abhängig von Stil / Licht / Format."""
     base = 0.30
 
     # Papier/Scan senkt
-    base += detect_paper_or_scan(img, warnings)
+    base += detect_paper_or_scan(white_ratio, warnings)
 
-    w, h = img.size
+    w, h = size
 
     # Quadratisch → KI-typisch
     if w == h:
@@ -85,8 +158,6 @@ def base_score_from_image(img: Image.Image, warnings: List[str]) -> float:
         warnings.append("Quadratisches Bildformat – KI-typisch.")
 
     # Cinematic Lighting (dunkle low-percentiles = künstliche Studiobeleuchtung)
-    gray = img.convert("L")
-    low_p = np.percentile(np.array(gray), 10)
     if low_p < 40:
         base += 0.15
         warnings.append("Cinematic Lighting erkannt – KI-typischer Stil.")
@@ -94,21 +165,23 @@ def base_score_from_image(img: Image.Image, warnings: List[str]) -> float:
     return max(0.05, min(base, 0.70))
 
 
-def exif_score(img: Image.Image, warnings: List[str]) -> float:
-    """EXIF stark gewichtet."""
+def exif_score(exif: Optional[Image.Exif], warnings: List[str]) -> float:
+    """EXIF stark gewichtet (None = EXIF nicht lesbar)."""
+    if exif is None:
+        warnings.append("EXIF nicht lesbar – wirkt KI-typisch.")
+        return 0.05
+
     try:
-        exif = img.getexif()
         if not exif or len(exif.keys()) == 0:
             warnings.append("Keine EXIF-Daten gefunden – KI typisch.")
             return 0.10
 
         # Echte Kamera entlastet stark
-        for tag, value in exif.items():
-            if ExifTags.TAGS.get(tag, tag) == "Make":
-                val = str(value).lower()
-                if any(k in val for k in ["canon", "sony", "nikon", "fujifilm"]):
-                    warnings.append(f"Echte Kamera erkannt ({value}).")
-                    return -0.30
+        make = exif.get(_TAG_MAKE)
+        if make is not None:
+            if _CAMERA_RE.search(str(make)):
+                warnings.append(f"Echte Kamera erkannt ({make}).")
+                return -0.30
 
     except:
         warnings.append("EXIF nicht lesbar – wirkt KI-typisch.")
@@ -117,11 +190,8 @@ def exif_score(img: Image.Image, warnings: List[str]) -> float:
     return 0.0
 
 
-def oversharp_score(img: Image.Image, warnings: List[str]) -> float:
+def oversharp_score(edge_mean: float, warnings: List[str]) -> float:
     """Oversharpening deutlich stärker gewichtet."""
-    laplace = img.filter(ImageFilter.FIND_EDGES)
-    edge_mean = ImageStat.Stat(laplace).mean[0]
-
     # Aggressivere Schwelle v0.5
     if edge_mean > 45:
         warnings.append("Übermäßig scharfe Konturen – KI-Oversharpening.")
@@ -130,11 +200,8 @@ def oversharp_score(img: Image.Image, warnings: List[str]) -> float:
     return 0.0
 
 
-def smoothness_score(img: Image.Image, warnings: List[str]) -> float:
+def smoothness_score(var: float, warnings: List[str]) -> float:
     """KI-Skin – Hautuniformität & Glättung."""
-    gray = img.convert("L")
-    var = ImageStat.Stat(gray).var[0]
-
     # Zu glatte Textur → KI
     if var < 260:
         warnings.append("Sehr glatte Haut- / Bildtexturen – KI-Glättung.")
@@ -148,10 +215,14 @@ def smoothness_score(img: Image.Image, warnings: List[str]) -> float:
     return 0.0
 
 
-def color_score(img: Image.Image, warnings: List[str]) -> float:
-    """Color-Grading / KI-Farbharmonie."""
-    stat = ImageStat.Stat(img)
-    std_r, std_g, std_b = stat.stddev
+def color_score(
+    channel_std: Optional[Tuple[float, float, float]], warnings: List[str]
+) -> float:
+    """Color-Grading / KI-Farbharmonie (entfällt bei Graustufen)."""
+    if channel_std is None:
+        return 0.0
+
+    std_r, std_g, std_b = channel_std
 
     saturation = (std_r + std_g + std_b) / 3
 
@@ -168,23 +239,17 @@ def color_score(img: Image.Image, warnings: List[str]) -> float:
     return 0.0
 
 
-def weird_hand_score(img: Image.Image, warnings: List[str]) -> float:
-    """Kontur-basierte Artefakt-Erkennung."""
-    try:
-        small = img.resize((128, 128))
-        edges = small.filter(ImageFilter.FIND_EDGES)
-        mean_edges = ImageStat.Stat(edges).mean[0]
-        if mean_edges > 45:
-            warnings.append("Stark segmentierte Konturen – KI-Artefakte möglich.")
-            return 0.20
-    except:
-        pass
+def weird_hand_score(thumb_edge_mean: float, warnings: List[str]) -> float:
+    """Kontur-basierte Artefakt-Erkennung (Kanten auf 128×128-Thumbnail)."""
+    if thumb_edge_mean > 45:
+        warnings.append("Stark segmentierte Konturen – KI-Artefakte möglich.")
+        return 0.20
     return 0.0
 
 
-def resolution_score(img: Image.Image, warnings: List[str]) -> float:
-    """Auflösung / Format."""
-    w, h = img.size
+def resolution_score(size: Tuple[int, int], warnings: List[str]) -> float:
+    """Auflösung / Format (Originalgröße)."""
+    w, h = size
     score = 0.0
 
     if w in (512, 768, 1024, 1536, 2048):
@@ -202,29 +267,40 @@ def resolution_score(img: Image.Image, warnings: List[str]) -> float:
 # HAUPTFUNKTION
 # -----------------------------------------------------------
 
-def analyze_image(data: bytes) -> Dict:
-    img = load_image(data)
+def analyze_image(data: Union[bytes, io.BytesIO]) -> Dict:
+    img, size = load_image(data)
     warnings = []
 
+    # EXIF einmalig parsen (None = nicht lesbar)
+    try:
+        exif = img.getexif()
+    except Exception:
+        exif = None
+
+    # Pixel-Statistiken einmalig; Format/EXIF vom Original
+    stats = _compute_stats(img)
+
     # Dynamischer BaseScore v0.5
-    score = base_score_from_image(img, warnings)
+    score = base_score_from_image(
+        size, stats["white_ratio"], stats["low_p10"], warnings
+    )
 
     # Heuristiken (pos/neg)
-    score += exif_score(img, warnings)
-    score += smoothness_score(img, warnings)
-    score += oversharp_score(img, warnings)
-    score += color_score(img, warnings)
-    score += resolution_score(img, warnings)
-    score += weird_hand_score(img, warnings)
+    score += exif_score(exif, warnings)
+    score += smoothness_score(stats["variance"], warnings)
+    score += oversharp_score(stats["edge_mean"], warnings)
+    score += color_score(stats["channel_std"], warnings)
+    score += resolution_score(size, warnings)
+    score += weird_hand_score(stats["thumb_edge_mean"], warnings)
 
     # Score clamp + runden
     score = max(0.0, min(score, 1.0))
     score = round(score, 2)
 
-    logger.info(f"Analyse v0.5: Score={score}, Warnings={len(warnings)}")
+    logger.info("Analyse v0.5: Score=%s, Warnings=%d", score, len(warnings))
 
     return {
         "is_ai_probability": score,
         "warnings": warnings,
-        "dimensions": {"width": img.size[0], "height": img.size[1]},
+        "dimensions": {"width": size[0], "height": size[1]},
     }
@@ -12,12 +12,15 @@
 """
 
 import io
-import hashlib
+import re
 import numpy as np
-from PIL import Image, ExifTags, ImageStat, ImageFilter
-from typing import Dict, List, Optional, Tuple
+import xxhash
+from PIL import Image, ExifTags, ImageFilter
+from typing import Callable, Dict, List, Optional, Tuple, Union
 from dataclasses import dataclass
 from enum import Enum
+from ..utils.settings import MAX_FILE_SIZE_MB
+from ._kernels import luma_stats, rgb_luma_stats
 
 
 # -----------------------------------------------------------
@@ -36,10 +39,13 @@ class DetectionLevel(Enum):
 class HeuristicConfig:
     """Configurable thresholds for heuristics"""
     # File size limits
-    max_file_size_mb: int = 20
+    max_file_size_mb: int = MAX_FILE_SIZE_MB
     max_dimension: int = 8192
     min_dimension: int = 32
     
+    # Fixed-size thumbnails are resized from a copy with this max edge length
+    working_max_edge: int = 512
+    
     # AI artifact thresholds (conservative)
     extreme_sharpness_threshold: float = 70.0  # Very high = obvious oversharpening
     extreme_smoothness_threshold: float = 150.0  # Very low variance = obvious smoothing
@@ -59,6 +65,26 @@ class HeuristicConfig:
 
 CONFIG = HeuristicConfig()
 
+# Score at which the pre-filter is confident enough to stop (OBVIOUS_AI)
+_OBVIOUS_AI_SCORE = 0.70
+
+# Metadata score that proves AI on its own (one generator marker in EXIF)
+_METADATA_PROOF_SCORE = 0.50
+
+# EXIF tag IDs checked for generator signatures (direct lookup, no scan)
+_SOFTWARE_TAGS = (
+    ExifTags.Base.Software,
+    ExifTags.Base.ProcessingSoftware,
+    ExifTags.Base.Model,
+)
+
+# Known AI generators, one alternation scanned per tag value
+_AI_RE = re.compile(
+    "|".join(["midjourney", "dall-?e", "stable ?diffusion",
+              "dreamstudio", "leonardo", "firefly"]),
+    re.IGNORECASE,
+)
+
 
 # -----------------------------------------------------------
 # VALIDATION
@@ -69,12 +95,32 @@ class ImageValidationError(Exception):
     pass
 
 
-def validate_image_data(data: bytes) -> None:
+# Raw bytes or an upload buffer (BytesIO) that is read without copying
+ImageData = Union[bytes, bytearray, memoryview, io.BytesIO]
+
+
+def _as_buffer(data: ImageData) -> memoryview:
+    """Zero-copy view of the raw image bytes"""
+    if isinstance(data, io.BytesIO):
+        return data.getbuffer()
+    return memoryview(data)
+
+
+def _as_stream(data: ImageData) -> io.BytesIO:
+    """Readable stream positioned at the start of the image bytes"""
+    if isinstance(data, io.BytesIO):
+        data.seek(0)
+        return data
+    return io.BytesIO(data)
+
+
+def validate_image_data(data: ImageData) -> None:
     """Validate image data before processing"""
-    if not data:
+    nbytes = _as_buffer(data).nbytes
+    if nbytes == 0:
         raise ImageValidationError("Empty image data")
     
-    size_mb = len(data) / (1024 * 1024)
+    size_mb = nbytes / (1024 * 1024)
     if size_mb > CONFIG.max_file_size_mb:
         raise ImageValidationError(
             f"Image too large: {size_mb:.1f}MB (max: {CONFIG.max_file_size_mb}MB)"
@@ -82,8 +128,9 @@ def validate_image_data(data: bytes) -> None:
     
     # Check if it's actually an image
     try:
-        img = Image.open(io.BytesIO(data))
-        w, h = img.size
+        # Context exit leaves a caller-owned stream open (unlike close())
+        with Image.open(_as_stream(data)) as img:
+            w, h = img.size
         
         if w > CONFIG.max_dimension or h > CONFIG.max_dimension:
             raise ImageValidationError(
@@ -94,30 +141,82 @@ def validate_image_data(data: bytes) -> None:
             raise ImageValidationError(
                 f"Dimensions too small: {w}x{h} (min: {CONFIG.min_dimension})"
             )
-        
-        img.close()
     except Exception as e:
         if isinstance(e, ImageValidationError):
             raise
         raise ImageValidationError(f"Invalid image format: {str(e)}")
 
 
-def load_image(data: bytes) -> Image.Image:
-    """Load and convert image to RGB"""
+def load_image(data: ImageData) -> Tuple[Image.Image, Tuple[int, int]]:
+    """
+    Load image at full resolution; RGB and grayscale (L) sources are used
+    as decoded, everything else is converted to RGB.
+    No draft(): the pixel thresholds are calibrated on the full decode,
+    and a reduced DCT scale shifts variance, edge mean and channel std.
+    Returns the image and its dimensions.
+    """
     try:
-        img = Image.open(io.BytesIO(data))
-        return img.convert("RGB")
+        img = Image.open(_as_stream(data))
+        size = img.size
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        # Decode here so corrupt or truncated files fail as validation errors
+        img.load()
+        return img, size
     except Exception as e:
         raise ImageValidationError(f"Failed to load image: {str(e)}")
 
 
+def working_copy(img: Image.Image) -> Image.Image:
+    """
+    Downscale to CONFIG.working_max_edge as source for fixed-size thumbnails.
+    Scale-sensitive statistics (variance, std, edge mean) must not use it.
+    """
+    w, h = img.size
+    scale = CONFIG.working_max_edge / max(w, h)
+    if scale >= 1:
+        return img
+    size = (max(1, round(w * scale)), max(1, round(h * scale)))
+    return img.resize(size, Image.Resampling.BILINEAR)
+
+
 # -----------------------------------------------------------
 # CONSERVATIVE HEURISTICS (Pre-Filter Only)
 # -----------------------------------------------------------
 
-def check_obvious_ai_artifacts(img: Image.Image) -> Tuple[float, List[str]]:
+def _compute_stats(img: Image.Image) -> Dict:
+    """
+    Compute every pixel statistic the checks need, once.
+    Variance, std and edge mean use the full decoded image, since the
+    thresholds are calibrated at that scale; only the fixed-size grid
+    thumbnail comes from the working copy.
+    The pixel checks then only compare these numbers against thresholds.
+    """
+    # One pass: luma variance, FIND_EDGES mean (first band), channel std
+    if img.mode == "L":
+        # Grayscale source: no color channels to compare
+        _, _, variance, _, edge_mean = luma_stats(np.asarray(img))
+        channel_std = None
+    else:
+        _, _, variance, _, edge_mean, *channel = rgb_luma_stats(np.asarray(img))
+        channel_std = tuple(channel)
+    
+    small = working_copy(img).resize((256, 256), Image.Resampling.LANCZOS)
+    grid_edges = np.asarray(small.filter(ImageFilter.FIND_EDGES).convert("L"))
+    
+    return {
+        "variance": variance,
+        "channel_std": channel_std,
+        "edge_mean": edge_mean,
+        "grid_edge_mean": float(grid_edges.mean()),
+        "grid_edge_std": float(grid_edges.std()),
+    }
+
+
+def check_obvious_ai_artifacts(stats: Dict) -> Tuple[float, List[str]]:
     """
     Check for OBVIOUS AI artifacts only.
+    Expects precomputed statistics from _compute_stats().
     Returns: (confidence_score, list_of_reasons)
     Score: 0.0 (no artifacts) to 1.0 (obvious AI)
     """
@@ -125,71 +224,56 @@ def check_obvious_ai_artifacts(img: Image.Image) -> Tuple[float, List[str]]:
     flags = []
     
     # 1. EXTREME oversharpening (obvious processing)
-    try:
-        edges = img.filter(ImageFilter.FIND_EDGES)
-        edge_mean = ImageStat.Stat(edges).mean[0]
-        
-        if edge_mean > CONFIG.extreme_sharpness_threshold:
-            score += 0.30
-            flags.append(f"Extreme sharpening detected (edge_mean={edge_mean:.1f})")
-    except Exception as e:
-        flags.append(f"Edge detection failed: {str(e)}")
+    edge_mean = stats["edge_mean"]
+    if edge_mean > CONFIG.extreme_sharpness_threshold:
+        score += 0.30
+        flags.append(f"Extreme sharpening detected (edge_mean={edge_mean:.1f})")
     
     # 2. EXTREME smoothness (obvious airbrushing/AI smoothing)
-    try:
-        gray = img.convert("L")
-        variance = ImageStat.Stat(gray).var[0]
-        
-        if variance < CONFIG.extreme_smoothness_threshold:
-            score += 0.25
-            flags.append(f"Extreme smoothness detected (variance={variance:.1f})")
-    except Exception as e:
-        flags.append(f"Smoothness check failed: {str(e)}")
+    variance = stats["variance"]
+    if variance < CONFIG.extreme_smoothness_threshold:
+        score += 0.25
+        flags.append(f"Extreme smoothness detected (variance={variance:.1f})")
     
-    # 3. Check for impossible geometry (downscaled check for speed)
-    try:
-        small = img.resize((256, 256), Image.Resampling.LANCZOS)
-        edges_small = small.filter(ImageFilter.FIND_EDGES)
-        edge_arr = np.array(edges_small.convert("L"))
-        
-        # Look for highly regular patterns (AI grid artifacts)
-        if edge_arr.std() < 10 and edge_arr.mean() > 50:
-            score += 0.20
-            flags.append("Regular pattern detected (possible AI grid artifacts)")
-    except Exception as e:
-        flags.append(f"Geometry check failed: {str(e)}")
+    # 3. Check for impossible geometry (highly regular AI grid artifacts)
+    if stats["grid_edge_std"] < 10 and stats["grid_edge_mean"] > 50:
+        score += 0.20
+        flags.append("Regular pattern detected (possible AI grid artifacts)")
     
     return min(score, 1.0), flags
 
 
-def check_metadata_red_flags(img: Image.Image) -> Tuple[float, List[str]]:
+def _read_exif(img: Image.Image) -> Optional[Image.Exif]:
+    """Parse the EXIF block once; None if it cannot be read"""
+    try:
+        return img.getexif()
+    except Exception:
+        return None
+
+
+def check_metadata_red_flags(
+    exif: Optional[Image.Exif]
+) -> Tuple[float, List[str]]:
     """
     Check metadata for AI red flags.
     Conservative: Only flag obvious AI markers.
+    Expects the parsed EXIF from _read_exif().
     """
     score = 0.0
     flags = []
     
     try:
         # Check for AI software signatures in EXIF
-        exif = img.getexif()
         if exif:
-            software_tags = []
-            for tag, value in exif.items():
-                tag_name = ExifTags.TAGS.get(tag, tag)
-                if tag_name in ["Software", "ProcessingSoftware", "Model"]:
-                    software_tags.append(str(value).lower())
-            
-            # Known AI generators
-            ai_markers = ["midjourney", "dalle", "stable diffusion", "stablediffusion", 
-                         "dreamstudio", "leonardo", "firefly"]
+            software_tags = [str(exif[tag]) for tag in _SOFTWARE_TAGS if tag in exif]
             
             for tag_value in software_tags:
-                for marker in ai_markers:
-                    if marker in tag_value:
-                        score += 0.50
-                        flags.append(f"AI software detected in metadata: {marker}")
-                        break
+                match = _AI_RE.search(tag_value)
+                if match:
+                    score += 0.50
+                    flags.append(
+                        f"AI software detected in metadata: {match.group(0).lower()}"
+                    )
     
     except Exception as e:
         # EXIF errors are not suspicious - just skip
@@ -198,15 +282,16 @@ def check_metadata_red_flags(img: Image.Image) -> Tuple[float, List[str]]:
     return min(score, 1.0), flags
 
 
-def check_format_patterns(img: Image.Image) -> Tuple[float, List[str]]:
+def check_format_patterns(size: Tuple[int, int]) -> Tuple[float, List[str]]:
     """
     Check image format for AI patterns.
     Only flag exact matches to known AI resolutions.
+    Expects the image dimensions from load_image().
     """
     score = 0.0
     flags = []
     
-    w, h = img.size
+    w, h = size
     
     # Exact match to common AI generator defaults
     if (w, h) in CONFIG.known_ai_resolutions or (h, w) in CONFIG.known_ai_resolutions:
@@ -216,32 +301,32 @@ def check_format_patterns(img: Image.Image) -> Tuple[float, List[str]]:
     return score, flags
 
 
-def check_color_anomalies(img: Image.Image) -> Tuple[float, List[str]]:
+def check_color_anomalies(stats: Dict) -> Tuple[float, List[str]]:
     """
     Check for AI-typical color processing.
     Conservative: Only extreme cases.
+    Expects precomputed statistics from _compute_stats().
     """
     score = 0.0
     flags = []
     
-    try:
-        stat = ImageStat.Stat(img)
-        std_r, std_g, std_b = stat.stddev
-        
-        # EXTREME color uniformity (all channels nearly identical)
-        max_diff = max(abs(std_r - std_g), abs(std_g - std_b), abs(std_r - std_b))
-        if max_diff < 3.0:
-            score += 0.15
-            flags.append(f"Extreme color uniformity detected (max_diff={max_diff:.2f})")
-        
-        # EXTREME saturation (unrealistic color boost)
-        avg_std = (std_r + std_g + std_b) / 3
-        if avg_std > 70:
-            score += 0.15
-            flags.append(f"Extreme color saturation detected (avg_std={avg_std:.1f})")
+    # Grayscale sources carry no color information
+    if stats["channel_std"] is None:
+        return score, flags
     
-    except Exception as e:
-        flags.append(f"Color analysis failed: {str(e)}")
+    std_r, std_g, std_b = stats["channel_std"]
+    
+    # EXTREME color uniformity (all channels nearly identical)
+    max_diff = max(abs(std_r - std_g), abs(std_g - std_b), abs(std_r - std_b))
+    if max_diff < 3.0:
+        score += 0.15
+        flags.append(f"Extreme color uniformity detected (max_diff={max_diff:.2f})")
+    
+    # EXTREME saturation (unrealistic color boost)
+    avg_std = (std_r + std_g + std_b) / 3
+    if avg_std > 70:
+        score += 0.15
+        flags.append(f"Extreme color saturation detected (avg_std={avg_std:.1f})")
     
     return score, flags
 
@@ -250,45 +335,99 @@ def check_color_anomalies(img: Image.Image) -> Tuple[float, List[str]]:
 # MAIN PRE-FILTER FUNCTION
 # -----------------------------------------------------------
 
-def prefilter_heuristics(img: Image.Image) -> Dict:
+def _run_check(
+    check_name: str,
+    check_func: Callable,
+    check_input: object,
+    scores_breakdown: Dict,
+    all_flags: List[str],
+) -> float:
+    """Run one check and record its result; returns its score"""
+    try:
+        score, flags = check_func(check_input)
+        all_flags.extend(flags)
+        scores_breakdown[check_name] = {
+            "score": round(score, 3),
+            "flags": flags
+        }
+        return score
+    except Exception as e:
+        all_flags.append(f"{check_name} check failed: {str(e)}")
+        scores_breakdown[check_name] = {
+            "score": 0.0,
+            "flags": [f"Check failed: {str(e)}"]
+        }
+        return 0.0
+
+
+def prefilter_heuristics(
+    img: Image.Image,
+    exif: Optional[Image.Exif],
+    size: Optional[Tuple[int, int]] = None,
+    stats: Optional[Dict] = None,
+) -> Dict:
     """
     Run conservative heuristics as pre-filter.
+    Cheap header checks (metadata, format) run first. Remaining checks are
+    skipped once an AI marker in metadata proves AI or the total reaches
+    OBVIOUS_AI; pixel statistics are only computed if a pixel check runs.
+    A metadata proof raises the score to the OBVIOUS_AI threshold.
+    Expects the parsed EXIF from _read_exif() (None if unreadable).
     Returns structured results for decision making.
     """
     all_flags = []
-    total_score = 0.0
+    scores_breakdown = {}
     
-    # Run all heuristic checks
+    if size is None:
+        size = img.size
+    
+    # Ordered by cost: header-only checks first
     checks = [
-        ("artifacts", check_obvious_ai_artifacts),
         ("metadata", check_metadata_red_flags),
         ("format", check_format_patterns),
+        ("artifacts", check_obvious_ai_artifacts),
         ("color", check_color_anomalies),
     ]
     
-    scores_breakdown = {}
-    
-    for check_name, check_func in checks:
-        try:
-            score, flags = check_func(img)
-            total_score += score
-            all_flags.extend(flags)
-            scores_breakdown[check_name] = {
-                "score": round(score, 3),
-                "flags": flags
-            }
-        except Exception as e:
-            all_flags.append(f"{check_name} check failed: {str(e)}")
-            scores_breakdown[check_name] = {
-                "score": 0.0,
-                "flags": [f"Check failed: {str(e)}"]
-            }
+    total_score = 0.0
+    proven_by_metadata = False
+    
+    for index, (check_name, check_func) in enumerate(checks):
+        if check_name == "metadata":
+            check_input = exif
+        elif check_name == "format":
+            check_input = size
+        else:
+            if stats is None:
+                stats = _compute_stats(img)
+            check_input = stats
+        
+        score = _run_check(
+            check_name, check_func, check_input, scores_breakdown, all_flags
+        )
+        total_score += score
+        
+        if check_name == "metadata" and score >= _METADATA_PROOF_SCORE:
+            proven_by_metadata = True
+        
+        # Early exit: the remaining checks cannot change the verdict
+        if proven_by_metadata or total_score >= _OBVIOUS_AI_SCORE:
+            for skipped_name, _ in checks[index + 1:]:
+                scores_breakdown[skipped_name] = {
+                    "score": 0.0,
+                    "flags": ["skipped (early exit)"]
+                }
+            break
+    
+    # An AI marker in metadata is decisive: report at least OBVIOUS_AI
+    if proven_by_metadata:
+        total_score = max(total_score, _OBVIOUS_AI_SCORE)
     
     # Clamp total score
     total_score = max(0.0, min(total_score, 1.0))
     
     # Determine detection level
-    if total_score >= 0.70:
+    if total_score >= _OBVIOUS_AI_SCORE:
         level = DetectionLevel.OBVIOUS_AI
         needs_ml = False
     elif total_score >= 0.40:
@@ -310,7 +449,7 @@ def prefilter_heuristics(img: Image.Image) -> Dict:
     }
 
 
-def analyze_image(data: bytes) -> Dict:
+def analyze_image(data: ImageData) -> Dict:
     """
     Main entry point for image analysis.
     Validates input and runs pre-filter heuristics.
@@ -320,27 +459,29 @@ def analyze_image(data: bytes) -> Dict:
         validate_image_data(data)
         
         # Load image
-        img = load_image(data)
-        w, h = img.size
+        img, (w, h) = load_image(data)
         
         # Calculate image hash for caching/deduplication
-        img_hash = hashlib.sha256(data).hexdigest()[:16]
+        raw = _as_buffer(data)
+        img_hash = xxhash.xxh3_128(raw).hexdigest()[:16]
         
-        # Run pre-filter heuristics
-        heuristic_results = prefilter_heuristics(img)
+        # Run pre-filter heuristics (pixel statistics computed on demand)
+        heuristic_results = prefilter_heuristics(img, _read_exif(img), (w, h))
         
         # Build response
         result = {
             "status": "success",
             "image_hash": img_hash,
             "dimensions": {"width": w, "height": h},
-            "file_size_kb": round(len(data) / 1024, 2),
+            "file_size_kb": round(raw.nbytes / 1024, 2),
             **heuristic_results,
             "ml_required": heuristic_results["needs_ml_verification"],
             "recommendation": _get_recommendation(heuristic_results),
         }
         
-        img.close()
+        # Leave a caller-owned upload stream open
+        if not isinstance(data, io.BytesIO):
+            img.close()
         return result
     
     except ImageValidationError as e:
@@ -361,8 +502,11 @@ def analyze_image(data: bytes) -> Dict:
 def _get_recommendation(heuristic_results: Dict) -> str:
     """Generate human-readable recommendation"""
     level = heuristic_results["detection_level"]
+    metadata = heuristic_results["scores_breakdown"].get("metadata", {})
     
     if level == DetectionLevel.OBVIOUS_AI.value:
+        if metadata.get("score", 0.0) >= _METADATA_PROOF_SCORE:
+            return "High confidence AI detection - AI generator signature in metadata"
         return "High confidence AI detection - multiple obvious artifacts found"
     elif level == DetectionLevel.SUSPICIOUS.value:
         return "Suspicious patterns detected - ML verification recommended"
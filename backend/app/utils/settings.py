@@ -0,0 +1,4 @@
+# Gemeinsame Grenzwerte für Router und Detektoren
+
+# Maximale Upload-/Bildgröße in MB
+MAX_FILE_SIZE_MB = 20
@@ -3,8 +3,24 @@ Test utilities for image_detector_enhanced.py
 """
 
 import io
+import sys
+import numpy as np
 from PIL import Image, ImageDraw, ImageFilter
-from image_detector_enhanced import analyze_image, selftest
+from app.services.image_detector_enhanced import analyze_image, selftest
+
+
+# Fixed seed keeps the generated images (and thus their scores) reproducible
+NOISE_SEED = 12345
+
+# Expected pre-filter scores for create_test_images() (regression check)
+EXPECTED_SCORES = {
+    "realistic_photo": 0.25,
+    "ai_resolution": 0.55,
+    "oversharpened": 0.15,
+    "extremely_smooth": 0.55,
+    "noisy_photo": 0.15,
+    "large_noisy_photo": 0.15,
+}
 
 
 def create_test_images():
@@ -48,24 +64,32 @@ def create_test_images():
     tests.append(("extremely_smooth", buf.getvalue()))
     
     # Test 5: Normal photo with noise
-    img = Image.new("RGB", (1280, 720))
-    pixels = img.load()
-    import random
-    for x in range(img.width):
-        for y in range(img.height):
-            noise = random.randint(-30, 30)
-            val = 128 + noise
-            pixels[x, y] = (val, val+10, val-10)
+    rng = np.random.default_rng(NOISE_SEED)
+    noise = rng.integers(-30, 31, size=(720, 1280), dtype=np.int8)
+    base = 128 + noise.astype(np.int16)
+    arr = np.stack([base, base + 10, base - 10], axis=-1)
+    img = Image.fromarray(arr.clip(0, 255).astype(np.uint8))
     
     buf = io.BytesIO()
     img.save(buf, format="JPEG", quality=80)
     tests.append(("noisy_photo", buf.getvalue()))
     
+    # Test 6: Large noisy photo (short edge >= 2048, full camera resolution)
+    noise = rng.integers(-30, 31, size=(3024, 4032), dtype=np.int8)
+    base = 128 + noise.astype(np.int16)
+    arr = np.stack([base, base + 10, base - 10], axis=-1)
+    img = Image.fromarray(arr.clip(0, 255).astype(np.uint8))
+    
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=80)
+    tests.append(("large_noisy_photo", buf.getvalue()))
+    
     return tests
 
 
 def run_comprehensive_tests():
-    """Run full test suite"""
+    """Run full test suite, returns the names of failed checks"""
+    failures = []
     print("=" * 60)
     print("IMAGE DETECTOR v0.6 - COMPREHENSIVE TEST SUITE")
     print("=" * 60)
@@ -79,6 +103,8 @@ def run_comprehensive_tests():
     for test in selftest_result['tests']:
         status_icon = "✓" if test['status'] == 'pass' else "✗"
         print(f"  {status_icon} {test['test']}: {test['details']}")
+        if test['status'] != 'pass':
+            failures.append(f"selftest:{test['test']}")
     
     # 2. Test images
     print("\n[2/3] Testing various image types...")
@@ -91,7 +117,12 @@ def run_comprehensive_tests():
             print(f"\n--- {name.upper()} ---")
             print(f"  Dimensions: {result['dimensions']['width']}x{result['dimensions']['height']}")
             print(f"  File size: {result['file_size_kb']} KB")
-            print(f"  Pre-filter score: {result['prefilter_score']}")
+            expected = EXPECTED_SCORES.get(name)
+            score_icon = "✓" if result['prefilter_score'] == expected else "✗"
+            if result['prefilter_score'] != expected:
+                failures.append(name)
+            print(f"  Pre-filter score: {result['prefilter_score']} "
+                  f"{score_icon} (expected {expected})")
             print(f"  Detection level: {result['detection_level']}")
             print(f"  Needs ML: {result['ml_required']}")
             print(f"  Recommendation: {result['recommendation']}")
@@ -103,6 +134,7 @@ def run_comprehensive_tests():
         else:
             print(f"\n--- {name.upper()} ---")
             print(f"  ERROR: {result['error_message']}")
+            failures.append(name)
     
     # 3. Edge cases
     print("\n[3/3] Testing edge cases...")
@@ -117,10 +149,16 @@ def run_comprehensive_tests():
         result = analyze_image(data)
         status_icon = "✓" if result['status'] == 'error' else "✗"
         print(f"  {status_icon} {name}: {result.get('error_message', 'Unexpected success')}")
+        if result['status'] != 'error':
+            failures.append(name)
     
     print("\n" + "=" * 60)
-    print("TEST SUITE COMPLETE")
+    if failures:
+        print(f"TEST SUITE FAILED: {', '.join(failures)}")
+    else:
+        print("TEST SUITE COMPLETE")
     print("=" * 60)
+    return failures
 
 
 def create_tiny_image():
@@ -174,7 +212,10 @@ def demo_usage():
 
 if __name__ == "__main__":
     # Run all tests
-    run_comprehensive_tests()
+    failures = run_comprehensive_tests()
     
     # Show usage demo
     demo_usage()
+    
+    # Non-zero exit so CI / scripts notice regressions
+    sys.exit(1 if failures else 0)
@@ -1,3 +1,5 @@
 #!/bin/bash
 source venv/bin/activate
-python server.py
+set -a; [ -f .env ] && source .env; set +a
+# gunicorn (gthread) provides wsgi.file_wrapper → static files go out via sendfile(2)
+gunicorn -k gthread --threads 4 -b 0.0.0.0:${PORT:-5050} server:app
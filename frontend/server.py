@@ -22,4 +22,6 @@ def config():
     return jsonify({"API_BASE_URL": API_BASE_URL})
 
 if __name__ == "__main__":
+    # Nur für lokale Entwicklung – produktiv über gunicorn starten (run.sh),
+    # dessen wsgi.file_wrapper statische Dateien per sendfile(2) ausliefert.
     app.run(host="0.0.0.0", port=PORT)